@@ -1,191 +1,591 @@
 import streamlit as st
-from openai import OpenAI
+from openai import AsyncOpenAI
+from pydantic_ai.models.openai import OpenAIModel
+import asyncio
+import contextlib
+import gc
+import hashlib
+import httpx
 import json
 import os
+import random
+import threading
+import uuid
+from dataclasses import dataclass
+from diskcache import Cache
 from dotenv import load_dotenv
 
 # Import article generation and search modules
-from article_generator import ArticleParameters, article_writer, generate_subqueries
-from search_service import ContentSearchService
+from article_generator import (
+    ARTICLE_MODELS,
+    ARTICLE_PROMPT,
+    DEFAULT_ARTICLE_MODEL,
+    ArticleParameters,
+    agenerate_subqueries,
+    article_writer,
+    generate_subqueries,
+    submit_article_batch,
+    wait_for_article_batch,
+)
+from embeddings import embed
+from llm_client import OPENAI_MAX_RETRIES, client
+from rerank import rerank_retrieved_content
+from search_service import NO_RESULTS_MESSAGE, ContentSearchService
+from semantic_cache import SemanticCache
+from utils.async_runner import run_async
 
 # Load environment variables and initialize OpenAI client
 load_dotenv(override=True)
 api_key = os.getenv('OPENAI_API_KEY')
-client = OpenAI(api_key=api_key)
 
 
-# Initialize search service with the API key
-search_service = ContentSearchService(api_key)
+# Streamlit re-executes this script on every rerun, so long-lived resources are created once per
+# process through st.cache_resource and shared by every session instead of being rebuilt each time
+@st.cache_resource
+def get_search_service():
+    """Search service shared by all sessions."""
+    return ContentSearchService()
 
-def update_article(article_index, new_content):
-    """Update an article in session state."""
-    if 0 <= article_index < len(st.session_state.generated_articles):
-        st.session_state.generated_articles[article_index] = new_content
+
+@st.cache_resource
+def get_batch_state():
+    """Results of article batches polled in background threads, keyed by batch id, and their lock."""
+    return {}, threading.Lock()
+
+
+@st.cache_resource
+def get_article_store():
+    """Article bodies are kept on disk; session state only holds their ids and titles."""
+    return Cache("./.articles")
+
+
+search_service = get_search_service()
+_batch_results, _batch_lock = get_batch_state()
+article_store = get_article_store()
+
+@dataclass(frozen=True, slots=True)
+class AutomatedTopic:
+    """A Tab 2 topic together with the keywords its articles should target."""
+    topic: str
+    keywords: tuple[str, ...]
+
+
+# Popular topics for automated article generation
+AUTOMATED_TOPICS = [
+    AutomatedTopic("property UK", ("UK housing", "homeowners", "property prices")),
+    AutomatedTopic("real estate UK", ("UK real estate", "commercial property", "residential property")),
+    AutomatedTopic("real estate news UK", ("property news", "housing policy", "market update")),
+    AutomatedTopic("property news UK", ("housing news", "house prices", "interest rates")),
+    AutomatedTopic("property market UK", ("house prices", "interest rates", "landlords")),
+    AutomatedTopic("real estate market UK", ("market trends", "housing supply", "buyer demand")),
+    AutomatedTopic("property investment UK", ("buy-to-let", "rental yield", "capital growth")),
+    AutomatedTopic("real estate investment UK", ("REITs", "commercial property", "investment returns")),
+    AutomatedTopic("property development UK", ("planning permission", "new builds", "housebuilders")),
+    AutomatedTopic("real estate development UK", ("regeneration", "brownfield sites", "construction costs")),
+    AutomatedTopic("property management UK", ("letting agents", "tenant management", "maintenance")),
+    AutomatedTopic("real estate management UK", ("asset management", "facilities management", "service charges")),
+    AutomatedTopic("property valuation UK", ("house valuation", "surveyors", "market value")),
+    AutomatedTopic("real estate valuation UK", ("RICS valuation", "commercial valuation", "yields")),
+    AutomatedTopic("property sale UK", ("selling a house", "estate agents", "asking prices")),
+    AutomatedTopic("real estate sale UK", ("property transactions", "conveyancing", "sale prices")),
+    AutomatedTopic("property rental UK", ("renters", "rental prices", "tenancy agreements")),
+    AutomatedTopic("real estate rental UK", ("private rented sector", "rent increases", "landlord regulation")),
+    AutomatedTopic("property purchase UK", ("first-time buyers", "mortgages", "stamp duty")),
+    AutomatedTopic("real estate purchase UK", ("buying property", "mortgage rates", "deposits")),
+]
+
+# Oldest articles are dropped beyond this many so a long-lived session can't grow without bound
+MAX_ARTICLES = 50
+
+# Seconds an article body is kept on disk after it was last written; sessions that are simply
+# closed never call clear_articles, so their bodies would otherwise stay in the store for good
+ARTICLE_TTL = 24 * 60 * 60
+
+# Instructions for the chat assistant; kept byte-identical across turns for prompt-cache hits
+CHAT_SYSTEM_PROMPT = (
+    "You are an AI assistant specialized in helping users refine and improve their articles. "
+    "When the user requests changes to the article, provide the complete updated version of the article. "
+    "Start your response with 'ARTICLE_UPDATE:' when providing an updated version. "
+    "Be constructive, specific, and friendly in your responses."
+    "Ask questions to clarify the user's intent and provide helpful suggestions if you don't understand."
+    "Don't change the general structure if not requested."
+)
+
+# Marker the assistant puts in front of a full rewritten article
+ARTICLE_UPDATE_MARKER = "ARTICLE_UPDATE:"
+
+# Chat models: substantial edits go to the full model, quick tweaks to the cheaper, faster one
+CHAT_MODEL = "gpt-4o"
+CHAT_MODEL_LIGHT = "gpt-4o-mini"
+COMPLEX_REQUEST_KEYWORDS = ("rewrite", "expand", "restructure", "add a section", "new section", "research")
+
+# Only the most recent messages are sent verbatim; older ones are folded into a running summary
+CHAT_HISTORY_WINDOW = 8
+SUMMARY_MAX_TOKENS = 200
+
+# Only the most recent messages are drawn in the chat tab so reruns stay cheap in long chats
+CHAT_RENDER_LIMIT = 50
+
+# Number of streamed chunks between placeholder redraws in the chat tab
+STREAM_RENDER_EVERY = 8
+
+# Semantic cache for chat replies; near-duplicate questions about the same article are served locally
+@st.cache_resource
+def get_semantic_cache():
+    """Process-wide semantic cache; its SQLite connection is opened once."""
+    return SemanticCache(ttl=3600)
+
+
+semantic_cache = get_semantic_cache()
+CACHE_SIMILARITY_THRESHOLD = 0.92
+
+def article_hash(body):
+    """Stable content hash used to key per-revision caches of an article."""
+    return hashlib.blake2b(body.encode()).hexdigest()
+
+
+@st.cache_resource(max_entries=4096, show_spinner=False)
+def _embed_text(text):
+    """Embed a short text once per process; the cached vector is read-only so callers can't alter it."""
+    vector = embed(client, [text])[0]
+    vector.setflags(write=False)
+    return vector
+
+
+def new_article_store():
+    """
+    Create the columnar article index kept in session state.
+
+    Bodies live in the on-disk article_store keyed by the ids in this index, so
+    session state only carries small per-article values between reruns.
+    """
+    return {
+        "ids": [],
+        "numbers": [],
+        "titles": [],
+        "sources": [],
+    }
+
+
+def get_article(article_id):
+    """Load an article body from the on-disk store; None once it has expired or been culled."""
+    return article_store.get(article_id)
+
+
+def add_articles(titles, bodies, sources, numbers):
+    """
+    Write generated article bodies to disk and append them to the session index.
+
+    `numbers` are the global "Article N" labels shown when the articles were generated.
+    Once more than MAX_ARTICLES are stored, the oldest ones are evicted from both.
+    """
+    articles = st.session_state.articles
+    for body in bodies:
+        article_id = str(uuid.uuid4())
+        article_store.set(article_id, body, expire=ARTICLE_TTL)
+        articles["ids"].append(article_id)
+    articles["numbers"].extend(numbers)
+    articles["titles"].extend(titles)
+    articles["sources"].extend(sources)
+    
+    overflow = len(articles["ids"]) - MAX_ARTICLES
+    if overflow > 0:
+        for article_id in articles["ids"][:overflow]:
+            article_store.delete(article_id)
+        for column in articles.values():
+            del column[:overflow]
+
+
+def clear_articles():
+    """Drop every article of this session from disk and session state."""
+    for article_id in st.session_state.articles["ids"]:
+        article_store.delete(article_id)
+    st.session_state.articles = new_article_store()
+    gc.collect()
+
+
+def update_article(article_id, new_content):
+    """Overwrite an article body in the on-disk store, restarting its expiry."""
+    if article_id in st.session_state.articles["ids"]:
+        article_store.set(article_id, new_content, expire=ARTICLE_TTL)
                 
 
-def chat_with_ai(message, chat_history, article_index=None, current_article=None):
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_subqueries(topic):
+    """Subqueries for `topic`, reused across reruns with the same topic."""
+    return generate_subqueries(topic)
+
+
+class EmptySearchResults(Exception):
+    """Raised out of _cached_search so st.cache_data doesn't keep a search that found nothing."""
+
+
+@st.cache_data(ttl=1800, show_spinner=False)
+def _cached_search(queries, sources, topic):
+    """Search and extraction results keyed by hashable tuples of queries and sources."""
+    search_results = search_service.search_and_extract(list(queries), list(sources), topic)
+    if search_results.rstrip().endswith(NO_RESULTS_MESSAGE):
+        raise EmptySearchResults(search_results)
+    return search_results
+
+
+def search_context(queries, sources, topic):
     """
-    Send the user's message plus history to OpenAI, handle 'ARTICLE_UPDATE:' logic,
-    and return the assistant's response.
+    Cached search and extraction for `queries` over `sources`.
+
+    A search that found nothing (usually a search host being down) is returned but not
+    cached, so the next click searches again instead of reusing the failure for 30 minutes.
     """
-    system_prompt = (
-        "You are an AI assistant specialized in helping users refine and improve their articles. "
-        "When the user requests changes to the article, provide the complete updated version of the article. "
-        "Start your response with 'ARTICLE_UPDATE:' when providing an updated version. "
-        "Be constructive, specific, and friendly in your responses."
-        "Ask questions to clarify the user's intent and provide helpful suggestions if you don't understand."
-        "Don't change the general structure if not requested."
-    )
+    try:
+        return _cached_search(tuple(queries), tuple(sources), topic)
+    except EmptySearchResults as e:
+        return e.args[0]
+
+
+@contextlib.asynccontextmanager
+async def _article_model(max_connections, model_name=DEFAULT_ARTICLE_MODEL):
+    """Yield an async client and writer model that share one connection pool sized to the batch."""
+    # One connection per article so concurrent calls don't queue behind the default pool
+    limits = httpx.Limits(max_connections=max_connections)
+    async with httpx.AsyncClient(http2=True, limits=limits, timeout=60.0) as async_http_client:
+        aclient = AsyncOpenAI(api_key=api_key, http_client=async_http_client, max_retries=OPENAI_MAX_RETRIES)
+        yield aclient, OpenAIModel(model_name, openai_client=aclient)
+
+
+async def _stream_article(user_prompt, deps, model, placeholder):
+    """Write one article, drawing its partial content into `placeholder` as it streams in."""
+    async with article_writer.run_stream(user_prompt=user_prompt, deps=deps, model=model) as result:
+        async for partial in result.stream():
+            if getattr(partial, "content", None):
+                placeholder.markdown(partial.content)
+        return await result.get_data()
+
+
+async def _generate_articles(article_params, user_prompt, placeholders, model_name):
+    """
+    Write one article per placeholder concurrently from the same retrieved context, in order.
+
+    A failed article is returned as its exception so the others are still kept.
+    """
+    async with _article_model(len(placeholders), model_name) as (_, model):
+        return await asyncio.gather(
+            *[_stream_article(user_prompt, article_params, model, placeholder) for placeholder in placeholders],
+            return_exceptions=True
+        )
+
+
+async def retrieve_context(article_params, aclient):
+    """
+    Run the subquery -> search -> rerank steps for a single article.
+
+    Returns the parameters updated with the retrieved content and whether the search produced any content.
+    """
+    topic = article_params.topic
+    
+    # 1. Generate subqueries for the topic
+    queries = await agenerate_subqueries(topic, aclient)
+    
+    # 2. Use the search engine to extract context from the web (cached in a worker thread, off the event loop)
+    search_results = await asyncio.to_thread(search_context, queries, article_params.sources, topic)
+    has_search_results = bool(search_results and search_results.strip() != "")
+    
+    # For debugging
+    if has_search_results:
+        print(f"\nFound search results for '{topic}'. Sample: {search_results[:300]}...\n")
+    else:
+        print(f"\nNo search results found for '{topic}'. Generating without sources.\n")
     
+    # Keep only the retrieved chunks most relevant to the topic and keywords
+    try:
+        query = " ".join([topic, *article_params.target_keywords])
+        search_results = await asyncio.to_thread(rerank_retrieved_content, client, search_results, query)
+    except Exception as e:
+        print(f"Rerank error: {e}")
+    
+    # 3. Update article parameters with the retrieved context
+    return article_params.model_copy(update={"retrieved_content": search_results}), has_search_results
+
+
+async def build_one(article_params, user_prompt, aclient, model, placeholder):
+    """
+    Run the retrieve -> write pipeline for a single article, streaming it into `placeholder`.
+
+    Returns the written Article and whether the search produced any content.
+    """
+    updated_article_params, has_search_results = await retrieve_context(article_params, aclient)
+    article = await _stream_article(user_prompt, updated_article_params, model, placeholder)
+    return article, has_search_results
+
+
+async def _build_articles(param_list, user_prompt, placeholders, model_name, on_done=None):
+    """
+    Run one full article pipeline per parameter set concurrently, returning results in order.
+
+    `on_done(i, article, has_search_results)` is called as each pipeline finishes, in completion order.
+    A failed pipeline is returned as its exception so the others are still kept.
+    """
+    async with _article_model(len(param_list), model_name) as (aclient, model):
+        async def run(i, article_params, placeholder):
+            article, has_search_results = await build_one(article_params, user_prompt, aclient, model, placeholder)
+            if on_done:
+                on_done(i, article, has_search_results)
+            return article, has_search_results
+        
+        return await asyncio.gather(
+            *[
+                run(i, article_params, placeholder)
+                for i, (article_params, placeholder) in enumerate(zip(param_list, placeholders))
+            ],
+            return_exceptions=True
+        )
+
+
+async def _retrieve_all(param_list):
+    """
+    Retrieve context for every parameter set concurrently, returning results in order.
+
+    A failed retrieval is returned as its exception so the others are still kept.
+    """
+    async with _article_model(len(param_list)) as (aclient, _):
+        return await asyncio.gather(
+            *[retrieve_context(article_params, aclient) for article_params in param_list],
+            return_exceptions=True
+        )
+
+
+def _poll_article_batch(batch_id):
+    """Wait for a queued article batch in a background thread and stash its result."""
+    try:
+        result = wait_for_article_batch(client, batch_id)
+    except Exception as e:
+        print(f"Article batch error: {e}")
+        result = e
+    with _batch_lock:
+        _batch_results[batch_id] = result
+
+
+def queue_article_batch(param_list, user_prompt, model_name):
+    """Submit articles to the Batch API and poll for the result in a background thread."""
+    batch_id = submit_article_batch(client, param_list, user_prompt, model_name)
+    st.session_state.pending_batches.append(batch_id)
+    threading.Thread(target=_poll_article_batch, args=(batch_id,), daemon=True).start()
+    return batch_id
+
+
+def collect_finished_batches():
+    """Move articles from finished background batches into session state."""
+    for batch_id in list(st.session_state.pending_batches):
+        with _batch_lock:
+            result = _batch_results.pop(batch_id, None)
+        if result is None:
+            continue
+        
+        st.session_state.pending_batches.remove(batch_id)
+        if isinstance(result, Exception):
+            st.error(f"Article batch {batch_id} failed: {result}")
+        elif result:
+            first_article = st.session_state.article_count + 1
+            st.session_state.article_count += len(result)
+            add_articles(
+                [article.title for article in result],
+                [article.content for article in result],
+                [article.sources for article in result],
+                range(first_article, st.session_state.article_count + 1)
+            )
+            st.success(f"Article batch {batch_id} finished with {len(result)} articles.")
+
+
+def _batched_deltas(stream):
+    """Yield streamed completion text in groups of STREAM_RENDER_EVERY chunks to limit redraws."""
+    pending = []
+    for n, chunk in enumerate(stream, 1):
+        if chunk.choices and chunk.choices[0].delta.content:
+            pending.append(chunk.choices[0].delta.content)
+        if pending and n % STREAM_RENDER_EVERY == 0:
+            yield "".join(pending)
+            pending = []
+    if pending:
+        yield "".join(pending)
+
+
+def choose_chat_model(message):
+    """Route long or substantial edit requests to the full model and quick tweaks to the light one."""
+    text = message.lower()
+    if len(message) > 200 or any(keyword in text for keyword in COMPLEX_REQUEST_KEYWORDS):
+        return CHAT_MODEL
+    return CHAT_MODEL_LIGHT
+
+
+def summarize_history(chat_history):
+    """
+    Return a summary of every message older than the last CHAT_HISTORY_WINDOW.
+
+    The summary is kept in session state and only extended with the messages that have
+    dropped out of the window since the last call, so each message is summarized once.
+    """
+    cutoff = max(len(chat_history) - CHAT_HISTORY_WINDOW, 0)
+    summary = st.session_state.setdefault("history_summary", {"count": 0, "text": ""})
+    if cutoff <= summary["count"]:
+        return summary["text"]
+    
+    dropped = "\n".join(f"{m['role']}: {m['content']}" for m in chat_history[summary["count"]:cutoff])
+    try:
+        response = client.chat.completions.create(
+            model=CHAT_MODEL_LIGHT,
+            messages=[
+                {"role": "system", "content": "Summarize this conversation about editing an article in a few sentences. "
+                                              "Keep the user's requests and any decisions that were made."},
+                {"role": "user", "content": f"Summary so far:\n{summary['text']}\n\nNew messages:\n{dropped}"}
+            ],
+            temperature=0,
+            max_tokens=SUMMARY_MAX_TOKENS
+        )
+        summary["text"] = response.choices[0].message.content.strip()
+        summary["count"] = cutoff
+    except Exception as e:
+        print(f"History summary error: {e}")
+    return summary["text"]
+
+
+def chat_cache_namespace(chat_history, article_id=None, current_article=None):
+    """
+    Semantic cache namespace for the next chat turn.
+
+    A reply depends on the article and on everything said before it, so the namespace covers
+    the article revision and a digest of the full history, which also determines the summary.
+    Chats without an article are scoped to the session so they are never replayed to other users.
+    """
+    history_hash = hashlib.blake2b(json.dumps(chat_history).encode()).hexdigest()
     if current_article:
-        system_prompt += f"\nHere is the current article:\n{current_article}"
+        return f"{article_id}:{article_hash(current_article)}:{history_hash}"
+    return f"session:{st.session_state.session_id}:{history_hash}"
+
+
+def chat_with_ai(message, chat_history, article_id=None, current_article=None, route_model=True):
+    """
+    Send the user's message plus history to OpenAI, stream the reply with st.write_stream,
+    handle 'ARTICLE_UPDATE:' logic, and return the assistant's response.
     
-    messages = [
-        {"role": "system", "content": system_prompt},
-        *chat_history,
+    With `route_model` enabled, simple requests are answered by CHAT_MODEL_LIGHT.
+    """
+    # Serve near-duplicate questions asked at the same point of the same conversation from the semantic cache
+    namespace = chat_cache_namespace(chat_history, article_id, current_article)
+    try:
+        query_vector = None
+        # Verbatim repeats are answered without embedding the message; the namespace covers the conversation
+        # so far, so short follow-ups like "yes" only match when asked at the same point of the same chat
+        cached_response = semantic_cache.get_exact(message, namespace)
+        if cached_response is None:
+            query_vector = _embed_text(message)
+            cached_response = semantic_cache.check(query_vector, namespace, CACHE_SIMILARITY_THRESHOLD)
+    except Exception as e:
+        print(f"Semantic cache lookup error: {e}")
+        query_vector, cached_response = None, None
+    if cached_response is not None:
+        st.markdown(cached_response)
+        return cached_response
+    
+    # The prompt is only built on a cache miss, so cache hits never wait on the history summary.
+    # The stable instructions come first and never change, so OpenAI's prefix cache can reuse them;
+    # the article follows as its own message so edits only invalidate the tail of the prompt
+    messages = [{"role": "system", "content": CHAT_SYSTEM_PROMPT}]
+    if current_article:
+        messages.append({"role": "system", "content": f"Here is the current article:\n{current_article}"})
+    # Older turns are replaced by a summary so input tokens per turn stay bounded
+    history_summary = summarize_history(chat_history)
+    if history_summary:
+        messages.append({"role": "system", "content": f"CONVERSATION_SO_FAR:\n{history_summary}"})
+    messages.extend([
+        *chat_history[-CHAT_HISTORY_WINDOW:],
         {"role": "user", "content": message}
-    ]
+    ])
     
     response = client.chat.completions.create(
-        model="gpt-4o",
+        model=choose_chat_model(message) if route_model else CHAT_MODEL,
         messages=messages,
         temperature=0.6, 
         presence_penalty=0.6, 
-        frequency_penalty=0.5 # Reduce repetition
+        frequency_penalty=0.5, # Reduce repetition
+        stream=True
     )
-    response_content = response.choices[0].message.content
     
-    # If the response contains an article update, update the article in session state
-    if "ARTICLE_UPDATE:" in response_content:
-        update_parts = response_content.split("ARTICLE_UPDATE:", 1)
-        new_article = update_parts[1].strip()
-        if article_index is not None:
-            update_article(article_index, new_article)
-        return update_parts[0].strip() + "\n\nArticle has been updated."
+    # Render tokens as they arrive; st.write_stream returns the full text once the stream ends
+    response_content = st.write_stream(_batched_deltas(response))
+    
+    # The model is told to lead with the marker, so check the start before scanning the whole reply
+    if response_content.startswith(ARTICLE_UPDATE_MARKER):
+        prefix, sep, new_article = "", ARTICLE_UPDATE_MARKER, response_content[len(ARTICLE_UPDATE_MARKER):]
+    else:
+        prefix, sep, new_article = response_content.partition(ARTICLE_UPDATE_MARKER)
+    
+    # Article updates depend on the article body at the time, so only plain replies are cached
+    if not sep:
+        if query_vector is not None:
+            semantic_cache.store(message, response_content, query_vector, namespace)
+        return response_content
+    
+    # The response contains an article update, so update the article in session state
+    if article_id is not None:
+        update_article(article_id, new_article.strip())
+    return prefix.strip() + "\n\nArticle has been updated."
+
+
+@st.fragment
+def chat_panel(article_id, current_article, route_model):
+    """
+    Chat history and input for the editing tab.
+
+    As a fragment, sending a message reruns only this panel instead of the whole app;
+    a full rerun is requested only when the article itself changed.
+    """
+    # Display chat history
+    st.subheader("Chat History")
+    if len(st.session_state.chat_history) > CHAT_RENDER_LIMIT:
+        st.caption(f"Showing the last {CHAT_RENDER_LIMIT} of {len(st.session_state.chat_history)} messages.")
+    for message in st.session_state.chat_history[-CHAT_RENDER_LIMIT:]:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
     
-    return response_content
+    # Chat input only fires on submit, so typing doesn't rerun the app
+    user_input = st.chat_input("Your message")
+    if user_input and user_input.strip():
+        # 1. Show the user message and add it to chat history
+        with st.chat_message("user"):
+            st.markdown(user_input.strip())
+        st.session_state.chat_history.append({"role": "user", "content": user_input.strip()})
+        # 2. Stream the AI response into an assistant bubble
+        with st.chat_message("assistant"):
+            ai_response = chat_with_ai(
+                user_input.strip(),
+                st.session_state.chat_history[:-1],
+                article_id,
+                current_article,
+                route_model
+            )
+        st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
+        # 3. Rerun the whole app only when the article changed so the sidebar shows the new version
+        if ai_response.endswith("Article has been updated."):
+            st.session_state.article_updated = True
+            st.rerun(scope="app")
 
 
 def main():
     st.set_page_config(page_title="AI Article Generator", page_icon="📝", layout="wide")
     
-    # Inject custom CSS for better chat styling, including an animation for article-updated messages
-    st.markdown(
-        """
-        <style>
-        /* Container for each message block */
-        .message-block {
-            padding: 1rem;
-            border-radius: 15px;
-            margin-bottom: 1rem;
-            max-width: 85%;
-            word-wrap: break-word;
-            box-shadow: 0 2px 8px rgba(0, 0, 0, 0.08);
-            transition: transform 0.2s ease, box-shadow 0.2s ease;
-        }
-        .message-block:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.12);
-        }
-
-        /* User messages */
-        .user-message {
-            background: linear-gradient(135deg, #6B8EFF, #4C6FFF);
-            border: none;
-            color: white;
-        }
-
-        /* Assistant messages */
-        .assistant-message {
-            background: white;
-            border: 2px solid #EEF2FF;
-            color: #2D3748;
-        }
-
-        /* Animate from success state to normal */
-        @keyframes ephemeralHighlight {
-            0% { 
-                background: linear-gradient(135deg, #84E1BC, #4FD1C5);
-                transform: scale(1.02);
-            }
-            100% { 
-                background: white;
-                transform: scale(1);
-            }
-        }
-
-        /* Article updated animation */
-        .article-updated {
-            animation: ephemeralHighlight 1.5s cubic-bezier(0.4, 0, 0.2, 1) forwards;
-            border: 2px solid #4FD1C5 !important;
-            color: #234E52 !important;
-        }
-
-        /* Message containers */
-        .assistant-container {
-            display: flex;
-            flex-direction: column;
-            align-items: flex-start;
-            padding: 0.5rem 1rem;
-        }
-        .user-container {
-            display: flex;
-            flex-direction: column;
-            align-items: flex-end;
-            padding: 0.5rem 1rem;
-        }
-
-        /* Add typing indicator for assistant messages */
-        .assistant-message::after {
-            content: '';
-            display: inline-block;
-            width: 4px;
-            height: 4px;
-            margin-left: 4px;
-            background: #4C6FFF;
-            border-radius: 50%;
-            vertical-align: middle;
-            animation: typing 1s infinite;
-        }
-
-        @keyframes typing {
-            0%, 100% { opacity: 0; }
-            50% { opacity: 1; }
-        }
-
-        /* Add some flair to strong tags within messages */
-        .message-block strong {
-            font-weight: 600;
-            position: relative;
-        }
-        .user-message strong {
-            color: #FFFFFF;
-            text-shadow: 0 1px 2px rgba(0, 0, 0, 0.1);
-        }
-        .assistant-message strong {
-            color: #4C6FFF;
-        }
-
-        /* Responsive adjustments */
-        @media (max-width: 768px) {
-            .message-block {
-                max-width: 95%;
-                margin-bottom: 0.8rem;
-            }
-        }
-        </style>
-        """,
-        unsafe_allow_html=True
-    )    
     # Initialize session state variables if they are not already set
-    if 'generated_articles' not in st.session_state:
-        st.session_state.generated_articles = []
+    if 'articles' not in st.session_state:
+        st.session_state.articles = new_article_store()
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = []
-    if 'chat_input_field' not in st.session_state:
-        st.session_state.chat_input_field = ""
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())
     if 'article_count' not in st.session_state:
         st.session_state.article_count = 0
+    if 'pending_batches' not in st.session_state:
+        st.session_state.pending_batches = []
+    
+    # Pick up articles from batches that finished since the last rerun
+    collect_finished_batches()
     
     
     # Create tabs with reordered positions: Tab1 (Manual), Tab2 (Automated), Tab3 (Chat Clone)
@@ -195,18 +595,34 @@ def main():
     with tab1:
         st.title("AI Article Generator Dashboard")
         
-        # Input fields for article generation
-        topic = st.text_input("Article Topic", help="Enter the main topic of your article.")
-        language_style = st.selectbox(
-            "Article Style",
-            options=["Daily Language", "Casual Language", "Business Language", "Technical", "Academic"],
-            help="Select the writing style for your article."
-        )
-        keywords = st.text_area("Target Keywords", help="Enter each keyword on a new line.")
-        num_articles = st.slider("Number of Articles", min_value=1, max_value=10, value=1)
-        sources = st.text_area("Additional Source Links", help="Enter additional source URLs, one per line.")
+        if st.session_state.pending_batches:
+            st.info(f"{len(st.session_state.pending_batches)} article batch(es) queued.")
+            st.button("Check queued batches")
         
-        if st.button("Generate Articles"):
+        # Input fields for article generation; inside a form so edits don't rerun the app until submit
+        with st.form("gen", clear_on_submit=False):
+            topic = st.text_input("Article Topic", help="Enter the main topic of your article.")
+            language_style = st.selectbox(
+                "Article Style",
+                options=["Daily Language", "Casual Language", "Business Language", "Technical", "Academic"],
+                help="Select the writing style for your article."
+            )
+            keywords = st.text_area("Target Keywords", help="Enter each keyword on a new line.")
+            num_articles = st.slider("Number of Articles", min_value=1, max_value=10, value=1)
+            model_name = st.selectbox(
+                "Model",
+                options=ARTICLE_MODELS,
+                index=ARTICLE_MODELS.index(DEFAULT_ARTICLE_MODEL),
+                help="gpt-4o-mini is much cheaper and faster; gpt-4o gives the highest quality."
+            )
+            sources = st.text_area("Additional Source Links", help="Enter additional source URLs, one per line.")
+            use_batch = st.checkbox(
+                "Run as batch (cheaper, slower)",
+                help="Queue the articles through the OpenAI Batch API at half the cost. Results can take up to 24 hours."
+            )
+            submitted = st.form_submit_button("Generate Articles")
+        
+        if submitted:
             if not topic or not keywords:
                 st.error("Please enter both a topic and target keywords!")
             else:
@@ -217,86 +633,95 @@ def main():
                 print("Source List: ", source_list)
 
                 
-                for i in range(num_articles):
-                    st.session_state.article_count += 1  # Increment article counter
-                    st.write(f"### Generating Article {st.session_state.article_count}...")
-                    
-                    # 1. Create article parameters
-                    article_params = ArticleParameters(
-                        topic=topic,
-                        language_style=language_style,
-                        target_keywords=keyword_list,
-                        sources=source_list
-                    )
-                    
-                    # 2. Generate subqueries for the topic
-                    sub_queries = generate_subqueries(topic)
-                    try:
-                        data = json.loads(sub_queries)
-                        queries = data.get("queries", [])
-                    except Exception as e:
-                        st.error("Error parsing subqueries: " + str(e))
-                        queries = []
-                    
-                    # 3. Use the search engine to extract context from the web
-                    search_results = search_service.search_and_extract(queries, source_list, topic)
-                    
-                    # Check if search results are empty (adding the same logging as in Tab 3)
-                    has_search_results = search_results and search_results.strip() != ""
-                    if not has_search_results:
-                        st.warning(f"No search results found for '{topic}'. Article will be generated without source citations.")
-                    
-                    # For debugging
-                    if has_search_results:
-                        print(f"\nFound search results for '{topic}'. Sample: {search_results[:300]}...\n")
-                    else:
-                        print(f"\nNo search results found for '{topic}'. Generating without sources.\n")
-                    
-                    # 4. Update article parameters with the retrieved context
-                    updated_article_params = article_params.model_copy(update={"retrieved_content": search_results})
-                    
-                    # 5. Generate the article using the agent with the same detailed prompt as Tab 3
-                    detailed_prompt = (
-                        "Write a detailed, informative article following these specific guidelines:\n\n"
-                        
-                        "CONTENT REQUIREMENTS:\n"
-                        "1. Augment and enhance the retrieved content with additional relevant information\n"
-                        "2. Organize the article with clear sections, headings, and a logical flow\n"
-                        "3. Use professional, business-oriented language matching the requested style\n\n"
-                                      
-                        "IMPORTANT:\n"
-                        "- If the retrieved content is empty, create a general informative article with no source mentions\n"
-                        "- Write the article with different sources for each section if possible\n"
-                        "- Make sure it is interesting and engaging"
-                    )
+                # 1. Create article parameters
+                article_params = ArticleParameters(
+                    topic=topic,
+                    language_style=language_style,
+                    target_keywords=keyword_list,
+                    sources=source_list
+                )
+                
+                # 2. Generate subqueries once for the topic (inputs are identical for every article)
+                try:
+                    queries = _cached_subqueries(topic)
+                except Exception as e:
+                    print(f"Subquery generation error: {e}")
+                    st.error(f"Couldn't generate subqueries: {e}")
+                    st.stop()
+                
+                # 3. Use the search engine to extract context from the web, shared by all articles
+                search_results = search_context(queries, source_list, topic)
+                
+                # Check if search results are empty (adding the same logging as in Tab 3)
+                has_search_results = search_results and search_results.strip() != ""
+                if not has_search_results:
+                    st.warning(f"No search results found for '{topic}'. Article will be generated without source citations.")
+                
+                # For debugging
+                if has_search_results:
+                    print(f"\nFound search results for '{topic}'. Sample: {search_results[:300]}...\n")
+                else:
+                    print(f"\nNo search results found for '{topic}'. Generating without sources.\n")
+                
+                # Keep only the retrieved chunks most relevant to the topic and keywords
+                try:
+                    search_results = rerank_retrieved_content(client, search_results, " ".join([topic, *keyword_list]))
+                except Exception as e:
+                    print(f"Rerank error: {e}")
+                
+                # 4. Update article parameters with the retrieved context
+                updated_article_params = article_params.model_copy(update={"retrieved_content": search_results})
+                
+                if use_batch:
+                    # 5. Queue the articles through the Batch API; they are collected on a later rerun
+                    batch_id = queue_article_batch([updated_article_params] * num_articles, ARTICLE_PROMPT, model_name)
+                    st.info(f"Queued batch {batch_id} with {num_articles} articles. They will be added to the article list when the batch completes.")
+                else:
+                    # 5. Write all articles concurrently, streaming each into its own placeholder
+                    first_article = st.session_state.article_count + 1
+                    st.session_state.article_count += num_articles
+                    placeholders = [st.empty() for _ in range(num_articles)]
+                    with st.spinner(f"Generating Articles {first_article}-{st.session_state.article_count}..."):
+                        results = run_async(_generate_articles(updated_article_params, ARTICLE_PROMPT, placeholders, model_name))
                     
-                    response = article_writer.run_sync(
-                        user_prompt=detailed_prompt,
-                        deps=updated_article_params
+                    # Keep every article that was written even if some of them failed
+                    articles = [article for article in results if not isinstance(article, Exception)]
+                    add_articles(
+                        [article.title for article in articles],
+                        [article.content for article in articles],
+                        [article.sources for article in articles],
+                        [first_article + i for i, article in enumerate(results) if not isinstance(article, Exception)]
                     )
-                    article_content = response.data.content
-                    article_sources = response.data.sources
-                    article_title = response.data.title
-                    st.session_state.generated_articles.append(article_content)
                     
-                    st.markdown(f"## {article_title}")
-                    st.markdown(article_content)
+                    for i, (article, placeholder) in enumerate(zip(results, placeholders)):
+                        if isinstance(article, Exception):
+                            print(f"Article generation error: {article}")
+                            placeholder.error(f"Article {first_article + i} failed: {article}")
+                            continue
+                        with placeholder.container():
+                            st.write(f"### Article {first_article + i}")
+                            
+                            article_content = article.content
+                            article_sources = article.sources
+                            article_title = article.title
+                            
+                            st.markdown(f"## {article_title}")
+                            st.markdown(article_content)
+                            
+                            # Only display sources if they exist and search results were found
+                            if has_search_results and article_sources:
+                                st.markdown("**Sources:**")
+                                st.markdown("\n".join(f"- {source}" for source in article_sources))
+                            else:
+                                st.markdown("**Note:** No specific external sources were used in this article.")
+                            
+                            st.markdown("---")
+                            st.markdown("---")
                     
-                    # Only display sources if they exist and search results were found
-                    if has_search_results and article_sources and isinstance(article_sources, list) and len(article_sources) > 0:
-                        st.markdown("**Sources:**")
-                        for source in article_sources:
-                            st.markdown(f"- {source}")
-                    elif has_search_results and article_sources and isinstance(article_sources, str) and article_sources.strip():
-                        st.markdown("**Sources:**")
-                        st.markdown(article_sources)
+                    if len(articles) == num_articles:
+                        st.success("Articles generated successfully!")
                     else:
-                        st.markdown("**Note:** No specific external sources were used in this article.")
-                    
-                    st.markdown("---")
-                    st.markdown("---")
-                
-                st.success("Articles generated successfully!")
+                        st.error(f"{num_articles - len(articles)} of {num_articles} articles failed.")
     
     # --- Tab 2: Automated Article Writer (moved from Tab 3) ---
     with tab2:
@@ -311,126 +736,105 @@ def main():
         
         # Input for number of articles
         auto_num_articles = st.slider("Number of Articles to Generate", min_value=1, max_value=10, value=1)
+        auto_model_name = st.selectbox(
+            "Model",
+            options=ARTICLE_MODELS,
+            index=ARTICLE_MODELS.index(DEFAULT_ARTICLE_MODEL),
+            help="gpt-4o-mini is much cheaper and faster; gpt-4o gives the highest quality.",
+            key="automatic_article_generator_model"
+        )
+        auto_use_batch = st.checkbox(
+            "Batch mode (cheaper, slower)",
+            help="Queue the articles through the OpenAI Batch API at half the cost. Results can take up to 24 hours."
+        )
         
         # Button to trigger generation
         if st.button("Generate Articles Automatically"):
             # Don't reset articles here - we want to append to existing articles from Tab 1
             
-            # Define popular topics for automated article generation
-            automated_topics = [
-                "property UK",
-                "real estate UK",
-                "real estate news UK",
-                "property news UK",
-                "property market UK",
-                "real estate market UK",
-                "property investment UK",
-                "real estate investment UK",
-                "property development UK",
-                "real estate development UK",
-                "property management UK",
-                "real estate management UK",
-                "property valuation UK",
-                "real estate valuation UK",
-                "property sale UK",
-                "real estate sale UK",
-                "property rental UK",
-                "real estate rental UK",
-                "property purchase UK",
-                "real estate purchase UK"
-            ]
-                      
             # Default sources
             default_sources = ["cheshirelife.co.uk", "theonlinelettingagents.co.uk", "theguardian.com", "landlordzone.co.uk/news"]
             
-            # Progress bar
-            progress_bar = st.progress(0)
+            # Pick distinct topics; only repeat topics once every topic has been used
+            selected_topics = random.sample(AUTOMATED_TOPICS, k=min(auto_num_articles, len(AUTOMATED_TOPICS)))
+            selected_topics += random.choices(AUTOMATED_TOPICS, k=auto_num_articles - len(selected_topics))
             
-            for i in range(auto_num_articles):
-                # Increment the global article counter
-                st.session_state.article_count += 1
-                
-                # Select topic based on index (or randomly if more articles than topics)
-                # Randomly select a topic from the automated_topics list
-                import random
-                topic_index = random.randint(0, len(automated_topics) - 1)
-                selected_topic = automated_topics[topic_index]
-                
-                # Get corresponding keywords
-                selected_keywords = []
-                
-                # Display status with global article counter
-                st.write(f"### Generating Article {st.session_state.article_count}")
-                
-                # 1. Create article parameters
-                article_params = ArticleParameters(
-                    topic=selected_topic,
+            # 1. Create article parameters
+            param_list = [
+                ArticleParameters(
+                    topic=selected_topic.topic,
                     language_style=language_style,  # Use the selected language style
-                    target_keywords=selected_keywords,
+                    target_keywords=list(selected_topic.keywords),
                     sources=default_sources
                 )
+                for selected_topic in selected_topics
+            ]
+            
+            if auto_use_batch:
+                # 2. Retrieve context for every article concurrently, then queue the writing as one batch
+                with st.spinner("Retrieving content for the batch..."):
+                    retrieved = run_async(_retrieve_all(param_list))
                 
-                # 2. Generate subqueries for the topic
-                sub_queries = generate_subqueries(selected_topic)
-                try:
-                    data = json.loads(sub_queries)
-                    queries = data.get("queries", [])
-                except Exception as e:
-                    st.error(f"Error parsing subqueries for {selected_topic}: {str(e)}")
-                    queries = []
-                
-                # 3. Use the search engine to extract context from the web
-                search_results = search_service.search_and_extract(queries, default_sources, selected_topic)
-                
-                # Check if search results are empty
-                has_search_results = search_results and search_results.strip() != ""
-                if not has_search_results:
-                    st.warning(f"No search results found for '{selected_topic}'. Article will be generated without source citations.")
-                
-                # 4. Update article parameters with the retrieved context
-                updated_article_params = article_params.model_copy(update={"retrieved_content": search_results})
+                # Queue every article whose retrieval succeeded and report the ones that failed
+                queued = [result[0] for result in retrieved if not isinstance(result, Exception)]
+                for i, result in enumerate(retrieved):
+                    if isinstance(result, Exception):
+                        print(f"Retrieval error for '{selected_topics[i].topic}': {result}")
+                        st.error(f"Retrieving content for '{selected_topics[i].topic}' failed: {result}")
+                if queued:
+                    batch_id = queue_article_batch(queued, ARTICLE_PROMPT, auto_model_name)
+                    st.info(f"Queued batch {batch_id} with {len(queued)} articles. They will be added to the article list when the batch completes.")
+            else:
+                # 2. Run every subquery -> search -> write pipeline concurrently, streaming each article
+                first_article = st.session_state.article_count + 1
+                st.session_state.article_count += auto_num_articles
+                status = st.status(f"Generating Articles {first_article}-{st.session_state.article_count}...", expanded=True)
+                placeholders = [st.empty() for _ in range(auto_num_articles)]
+                finished = []
                 
-                # 5. Generate the article using the agent with structured instructions
-                detailed_prompt = (
-                    "Write a detailed, informative article following these specific guidelines:\n\n"
-                    
-                    "CONTENT REQUIREMENTS:\n"
-                    "1. Augment and enhance the retrieved content with additional relevant information\n"
-                    "2. Organize the article with clear sections, headings, and a logical flow\n"
-                    "3. Use professional, business-oriented language matching the requested style\n\n"
-                                    
-                    "IMPORTANT:\n"
-                    "- If the retrieved content is empty, create a general informative article with no source mentions\n"
-                    "- Write the article with different sources for each section if possible\n"
-                    "- Make sure it is interesting and engaging"
-                )
+                def show_article(i, article, has_search_results):
+                    """Replace the streamed preview with the finished article as soon as it arrives."""
+                    finished.append(i)
+                    status.write(f"Article {first_article + i} ready: {article.title}")
+                    status.update(label=f"Generated {len(finished)}/{auto_num_articles} articles...")
+                    with placeholders[i].container():
+                        # Display status with global article counter
+                        st.write(f"### Article {first_article + i}")
+                        
+                        if not has_search_results:
+                            st.warning(f"No search results found for '{selected_topics[i].topic}'. Article will be generated without source citations.")
+                        
+                        # Display the article
+                        st.markdown(f"## {article.title}")
+                        st.markdown(article.content)
                 
-                # For debugging
-                if has_search_results:
-                    print(f"\nFound search results for '{selected_topic}'. Sample: {search_results[:300]}...\n")
-                else:
-                    print(f"\nNo search results found for '{selected_topic}'. Generating without sources.\n")
+                results = run_async(_build_articles(param_list, ARTICLE_PROMPT, placeholders, auto_model_name, show_article))
                 
-                response = article_writer.run_sync(
-                    user_prompt=detailed_prompt,
-                    deps=updated_article_params
+                # Store the generated articles in the same shared session state, in display order,
+                # keeping every article that was written even if some pipelines failed
+                articles = [result[0] for result in results if not isinstance(result, Exception)]
+                add_articles(
+                    [article.title for article in articles],
+                    [article.content for article in articles],
+                    [article.sources for article in articles],
+                    [first_article + i for i, result in enumerate(results) if not isinstance(result, Exception)]
                 )
                 
-                article_content = response.data.content
-                article_sources = response.data.sources
-                article_title = response.data.title
-                
-                # Store the generated article in the same shared session state
-                st.session_state.generated_articles.append(article_content)
+                for i, result in enumerate(results):
+                    if isinstance(result, Exception):
+                        print(f"Article pipeline error for '{selected_topics[i].topic}': {result}")
+                        placeholders[i].error(f"Article {first_article + i} ('{selected_topics[i].topic}') failed: {result}")
                 
-                # Display the article
-                st.markdown(f"## {article_title}")
-                st.markdown(article_content)        
-                # Update progress
-                progress_bar.progress((i + 1) / auto_num_articles)
-            
-            st.success(f"Successfully generated {auto_num_articles} articles automatically!")
-            st.balloons()
+                if len(articles) == auto_num_articles:
+                    status.update(label=f"Generated {auto_num_articles} articles", state="complete", expanded=False)
+                    st.success(f"Successfully generated {auto_num_articles} articles automatically!")
+                    st.balloons()
+                else:
+                    status.update(
+                        label=f"Generated {len(articles)}/{auto_num_articles} articles; {auto_num_articles - len(articles)} failed",
+                        state="error"
+                    )
+                    st.error(f"{auto_num_articles - len(articles)} of {auto_num_articles} articles failed.")
 
     # --- Tab 3: ChatGPT-like Clone for Article Modification (moved from Tab 2) ---
     with tab3:
@@ -441,90 +845,55 @@ def main():
         with col2:
             if st.button("🗑️ Clear Chat"):
                 st.session_state.chat_history = []
+                st.session_state.pop("history_summary", None)
                 st.rerun()
+            if st.button("🗑️ Clear All Articles"):
+                clear_articles()
+                st.rerun()
+        route_model = st.toggle(
+            "Fast mode for simple edits",
+            value=True,
+            help=f"Answer short, simple requests with {CHAT_MODEL_LIGHT}; rewrites and long requests still use {CHAT_MODEL}."
+        )
 
         # Sidebar: Select an article to modify - now includes articles from both Tab 1 and Tab 2
         with st.sidebar:
             st.header("Select Article to Modify")
-            if st.session_state.generated_articles:
-                article_options = {f"Article {i+1}": article for i, article in enumerate(st.session_state.generated_articles)}
-                article_options["No Article"] = None
-                selected_article_key = st.selectbox("Choose an article:", list(article_options.keys()))
-                if selected_article_key != "No Article":
-                    current_article = article_options[selected_article_key]
-                    article_index = int(selected_article_key.split()[1]) - 1
+            articles = st.session_state.articles
+            if articles["titles"]:
+                # Options are article ids, so evicting old articles never shifts the selection to another one;
+                # the selected id is kept in session state since the widget resets when its options change
+                options = [*articles["ids"], None]
+                labels = {
+                    article_id: f"Article {number}: {title}"
+                    for article_id, number, title in zip(articles["ids"], articles["numbers"], articles["titles"])
+                }
+                selected = st.session_state.get("selected_article_id", articles["ids"][0])
+                article_id = st.selectbox(
+                    "Choose an article:",
+                    options,
+                    index=options.index(selected) if selected in options else 0,
+                    format_func=lambda article_id: labels.get(article_id, "No Article")
+                )
+                st.session_state.selected_article_id = article_id
+                current_article = None if article_id is None else get_article(article_id)
+                if article_id is not None and current_article is None:
+                    st.warning("This article is no longer stored. Please generate it again or choose another one.")
+                    article_id = None
+                if current_article is not None:
                     st.markdown("### Selected Article:")
-                    st.markdown(current_article)
-                else:
-                    current_article = None
-                    article_index = None
+                    with st.expander("Preview", expanded=False):
+                        st.markdown(current_article)
             else:
                 st.info("No articles available. Please generate articles in Tab 1 or Tab 2 first.")
                 current_article = None
-                article_index = None
+                article_id = None
         
-        # Display chat history
-        st.subheader("Chat History")
-        for message in st.session_state.chat_history:
-            role = message["role"]
-            content = message["content"]
-            
-            # Determine if it's a user or assistant message
-            if role == "user":
-                # User container
-                st.markdown(
-                    f"""
-                    <div class="user-container">
-                        <div class="message-block user-message">
-                            <strong>User:</strong> {content}
-                        </div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-            else:
-                # Assistant container
-                if "Article has been updated." in content:
-                    # This triggers the ephemeral green highlight animation
-                    st.markdown(
-                        f"""
-                        <div class="assistant-container">
-                            <div class="message-block assistant-message article-updated">
-                                <strong>Assistant:</strong> {content}
-                            </div>
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
-                else:
-                    st.markdown(
-                        f"""
-                        <div class="assistant-container">
-                            <div class="message-block assistant-message">
-                                <strong>Assistant:</strong> {content}
-                            </div>
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
+        # Announce an article update once, after the rerun that shows the new version
+        if st.session_state.pop("article_updated", False):
+            st.toast("Article updated", icon="✅")
         
-        # Chat input + Send button
-        user_input = st.text_input("Your message")
-        if st.button("Send"):
-            # If there's user input, append it and get the AI response
-            if user_input.strip():
-                # 1. Add the user message to chat history
-                st.session_state.chat_history.append({"role": "user", "content": user_input.strip()})
-                # 2. Get AI response
-                ai_response = chat_with_ai(
-                    user_input.strip(),
-                    st.session_state.chat_history[:-1],
-                    article_index,
-                    current_article
-                )
-                st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                # # 3. Rerun so the chat updates immediately
-                st.rerun()
+        chat_panel(article_id, current_article, route_model)
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,17 @@
-from typing import List, Optional
-from openai import OpenAI
-from pydantic import BaseModel
+from typing import Final, List, Optional, Tuple
+from openai import AsyncOpenAI, OpenAI
+from pydantic import BaseModel, field_validator
 from pydantic_ai import Agent, RunContext
 from pydantic_ai.models.openai import OpenAIModel
 from utils.markdown import to_markdown
+from llm_cache import cached_llm
+from llm_client import client as shared_client
 from dotenv import load_dotenv
 import nest_asyncio
-import os
+import functools
+import io
 import json
+import time
 from dotenv import load_dotenv
 from utils.markdown import to_markdown
 
@@ -18,22 +22,31 @@ load_dotenv()
 class SubQuery(BaseModel):
     queries: List[str]
 
-def generate_subqueries(topic: str) -> List[str]:
-    """
-    Generate 3 refined subqueries for a given topic by adding relevant keywords.
-
-    The function sends a prompt to the GPT-4 API asking for subqueries that enhance the search intent.
-    It expects a JSON array of strings as output.
-
-    Parameters:
-        topic (str): The base topic for which to generate subqueries.
+@cached_llm
+def _parse_completion(client: OpenAI, *, model, messages, temperature, response_format) -> str:
+    """Structured-output completion whose raw JSON content is cached on disk."""
+    completion = client.beta.chat.completions.parse(
+        model=model,
+        messages=messages,
+        response_format=response_format,
+        temperature=temperature,
+    )
+    return completion.choices[0].message.content
 
-    Returns:
-        List[str]: A list of subqueries.
-    """
-    client = OpenAI()
+@cached_llm
+async def _aparse_completion(client: AsyncOpenAI, *, model, messages, temperature, response_format) -> str:
+    """Async variant of _parse_completion sharing the same cache."""
+    completion = await client.beta.chat.completions.parse(
+        model=model,
+        messages=messages,
+        response_format=response_format,
+        temperature=temperature,
+    )
+    return completion.choices[0].message.content
 
-    messages = [
+def _subquery_messages(topic: str) -> List[dict]:
+    """Build the chat messages used to ask the model for subqueries."""
+    return [
         {
             "role": "system",
             "content": (
@@ -56,15 +69,49 @@ def generate_subqueries(topic: str) -> List[str]:
         }
     ]
 
-    
-    completion = client.beta.chat.completions.parse(
+@functools.lru_cache(maxsize=128)
+def generate_subqueries(topic: str) -> Tuple[str, ...]:
+    """
+    Generate 3 refined subqueries for a given topic by adding relevant keywords.
+
+    The function sends a prompt to the GPT-4 API asking for subqueries that enhance the search intent
+    and validates the structured output against SubQuery. Results are memoized per topic, so
+    repeated clicks for the same topic within a process skip the LLM call.
+
+    Parameters:
+        topic (str): The base topic for which to generate subqueries.
+
+    Returns:
+        Tuple[str, ...]: The subqueries, as a tuple so the memoized value can't be mutated.
+    """
+    content = _parse_completion(
+        shared_client,
         model="gpt-4o",
-        messages=messages,
+        messages=_subquery_messages(topic),
         response_format=SubQuery,
         temperature=0.7,
     )
+    return tuple(SubQuery.model_validate_json(content).queries)
 
-    return completion.choices[0].message.content
+async def agenerate_subqueries(topic: str, client: Optional[AsyncOpenAI] = None) -> Tuple[str, ...]:
+    """
+    Async variant of generate_subqueries so several article pipelines can run concurrently.
+
+    Parameters:
+        topic (str): The base topic for which to generate subqueries.
+        client (AsyncOpenAI, optional): Shared async client; a new one is created if omitted.
+
+    Returns:
+        Tuple[str, ...]: The subqueries.
+    """
+    content = await _aparse_completion(
+        client or AsyncOpenAI(),
+        model="gpt-4o",
+        messages=_subquery_messages(topic),
+        response_format=SubQuery,
+        temperature=0.7,
+    )
+    return tuple(SubQuery.model_validate_json(content).queries)
 
 class ArticleParameters(BaseModel):
     topic: str
@@ -73,23 +120,30 @@ class ArticleParameters(BaseModel):
     sources: Optional[List[str]] = None
     retrieved_content: Optional[str] = None
     
-model = OpenAIModel("gpt-4o")
+# Writer models offered in the UI; the cheaper, faster one is the default
+ARTICLE_MODELS = ["gpt-4o-mini", "gpt-4o"]
+DEFAULT_ARTICLE_MODEL = ARTICLE_MODELS[0]
+
+model = OpenAIModel(DEFAULT_ARTICLE_MODEL)
 
 
 class Article(BaseModel):
     title: str
     content: str
-    sources: Optional[List[str]] = None
+    sources: List[str] = []
 
+    @field_validator("sources", mode="before")
+    @classmethod
+    def normalize_sources(cls, raw):
+        """The model sometimes returns sources as one string or null; always store a list."""
+        if raw is None:
+            return []
+        if isinstance(raw, str):
+            return [s.strip() for s in raw.splitlines() if s.strip()]
+        return raw
 
-article_writer = Agent(
-    name="Article Writer Agent",
-    model=model,
-    # model_settings={"temperature": 1.2}, # This is for more creative writing
-    result_type=Article,
-    deps_type=ArticleParameters,
-    retries=3,
-    system_prompt="""You are an expert AI content creator writing high-quality articles.
+
+ARTICLE_SYSTEM_PROMPT = """You are an expert AI content creator writing high-quality articles.
 
     Key Guidelines:
     1. Content Quality:
@@ -121,20 +175,47 @@ article_writer = Agent(
 
 
     Always aim for engaging, informative, and well-organized articles that serve their intended purpose."""
+
+# User prompt shared by every article request; defined once so both tabs and the batch path send the same instructions
+ARTICLE_PROMPT: Final[str] = (
+    "Write a detailed, informative article following these specific guidelines:\n\n"
+    
+    "CONTENT REQUIREMENTS:\n"
+    "1. Augment and enhance the retrieved content with additional relevant information\n"
+    "2. Organize the article with clear sections, headings, and a logical flow\n"
+    "3. Use professional, business-oriented language matching the requested style\n\n"
+    
+    "IMPORTANT:\n"
+    "- If the retrieved content is empty, create a general informative article with no source mentions\n"
+    "- Write the article with different sources for each section if possible\n"
+    "- Make sure it is interesting and engaging"
 )
 
-@article_writer.system_prompt
-async def add_article_parameters(ctx: RunContext[ArticleParameters]) -> str:
+article_writer = Agent(
+    name="Article Writer Agent",
+    model=model,
+    # model_settings={"temperature": 1.2}, # This is for more creative writing
+    result_type=Article,
+    deps_type=ArticleParameters,
+    retries=3,
+    system_prompt=ARTICLE_SYSTEM_PROMPT
+)
+
+def render_article_parameters(params: ArticleParameters) -> str:
+    """Render article parameters as the markdown block appended to the writer's system prompt."""
     # Convert the article parameters into a detailed markdown representation.
     # This provides a clear, formatted description for the article writer model.
+    # Fields go from most to least stable across runs so consecutive requests share the
+    # longest possible prompt prefix; the retrieved content, which changes every run, is last.
     details = (
-        f"Topic: {ctx.deps.topic}\n"
-        f"Language Style: {ctx.deps.language_style}\n"
-        f"Target Keywords: {', '.join(ctx.deps.target_keywords)}\n"
-        f"Available Sources Are: {ctx.deps.sources}\n Make sure use these website names while citing"
+        f"Available Sources Are: {params.sources}\n Make sure use these website names while citing\n"
+        f"Language Style: {params.language_style}\n"
+        f"Topic: {params.topic}\n"
     )
-    if ctx.deps.retrieved_content:
-        details += f"Retrieved Content: {ctx.deps.retrieved_content}\n"
+    if params.target_keywords:
+        details += f"Target Keywords: {', '.join(params.target_keywords)}\n"
+    if params.retrieved_content:
+        details += f"Retrieved Content: {params.retrieved_content}\n"
     else:
         details += "Retrieved Content: None provided.\n"
     
@@ -142,6 +223,86 @@ async def add_article_parameters(ctx: RunContext[ArticleParameters]) -> str:
     deps_md = to_markdown(details)
     return f"Article details:\n{deps_md}"
 
+@article_writer.system_prompt
+async def add_article_parameters(ctx: RunContext[ArticleParameters]) -> str:
+    return render_article_parameters(ctx.deps)
+
+def submit_article_batch(
+    client: OpenAI, param_list: List[ArticleParameters], user_prompt: str, model_name: str = DEFAULT_ARTICLE_MODEL
+) -> str:
+    """
+    Queue one article per parameter set through the OpenAI Batch API.
+
+    Each request mirrors what article_writer sends (same system prompt and rendered
+    parameters) and asks for the Article schema as structured output. Batch requests
+    are billed at half price but may take up to 24 hours to complete.
+
+    Returns:
+        str: The id of the created batch.
+    """
+    response_format = {
+        "type": "json_schema",
+        "json_schema": {"name": "Article", "schema": Article.model_json_schema()}
+    }
+    lines = [
+        json.dumps({
+            "custom_id": f"art-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model_name,
+                "messages": [
+                    {"role": "system", "content": ARTICLE_SYSTEM_PROMPT},
+                    {"role": "system", "content": render_article_parameters(params)},
+                    {"role": "user", "content": user_prompt}
+                ],
+                "response_format": response_format
+            }
+        })
+        for i, params in enumerate(param_list)
+    ]
+    
+    batch_file = client.files.create(file=io.BytesIO("\n".join(lines).encode()), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+def wait_for_article_batch(
+    client: OpenAI, batch_id: str, poll_interval: float = 30.0, max_poll_interval: float = 600.0
+) -> List[Article]:
+    """
+    Block until a batch created by submit_article_batch finishes and return its articles.
+
+    The poll interval doubles after every check, up to `max_poll_interval` seconds.
+    Articles are returned in submission order; requests that failed are skipped.
+    """
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"Article batch {batch_id} ended with status '{batch.status}'")
+        if batch.status == "completed":
+            break
+        time.sleep(poll_interval)
+        poll_interval = min(poll_interval * 2, max_poll_interval)
+    
+    if not batch.output_file_id:
+        return []
+    
+    articles = {}
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        try:
+            content = result["response"]["body"]["choices"][0]["message"]["content"]
+            articles[result["custom_id"]] = Article.model_validate_json(content)
+        except Exception as e:
+            print(f"Batch result error for {result.get('custom_id')}: {e}")
+    return [articles[key] for key in sorted(articles, key=lambda k: int(k.split("-")[1]))]
+
 if __name__ == "__main__":
     sampleArticle = ArticleParameters(
         topic="sustainable energy trends",
@@ -151,12 +312,9 @@ if __name__ == "__main__":
     )
 
     from search_service import ContentSearchService 
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    service = ContentSearchService(OPENAI_API_KEY)
+    service = ContentSearchService()
     
-    sub_queries = generate_subqueries(topic=sampleArticle.topic)
-    data = json.loads(sub_queries)
-    queries = data["queries"]
+    queries = list(generate_subqueries(topic=sampleArticle.topic))
     print("Generated Subqueries:", queries)
     
     search_results = service.search_and_extract(queries, sampleArticle.sources, sampleArticle.topic)
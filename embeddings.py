@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+import numpy as np
+from openai import OpenAI
+
+# Embedding model shared by the semantic cache and any similarity search
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Maximum number of inputs the embeddings endpoint accepts in one request
+EMBEDDING_BATCH_SIZE = 2048
+
+
+def _windows(texts: List[str]) -> List[List[str]]:
+    """Split texts into request-sized batches."""
+    return [texts[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+
+
+def _to_matrix(responses) -> np.ndarray:
+    """Stack the embeddings of one or more API responses into a float32 matrix."""
+    return np.array([item.embedding for response in responses for item in response.data], dtype=np.float32)
+
+
+def embed(client: OpenAI, texts: List[str]) -> np.ndarray:
+    """
+    Embed a list of texts with the OpenAI embeddings API.
+
+    Texts are sent in batches of up to EMBEDDING_BATCH_SIZE inputs, so N texts cost
+    ceil(N / 2048) requests; multiple batches are sent concurrently.
+
+    Parameters:
+        client (OpenAI): Client used for the embeddings request.
+        texts (List[str]): Texts to embed.
+
+    Returns:
+        np.ndarray: A float32 matrix with one row per input text.
+    """
+    windows = _windows(texts)
+    if len(windows) <= 1:
+        return _to_matrix([client.embeddings.create(model=EMBEDDING_MODEL, input=texts)])
+
+    with ThreadPoolExecutor(max_workers=len(windows)) as pool:
+        responses = pool.map(lambda window: client.embeddings.create(model=EMBEDDING_MODEL, input=window), windows)
+        return _to_matrix(list(responses))
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize float vectors to int8 with one symmetric scale per row.
+
+    Parameters:
+        vectors (np.ndarray): A single vector or a matrix with one vector per row.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The int8 values and the per-row scales, so that
+        `values * scales[..., None]` approximates the input.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=-1) / 127
+    safe_scales = np.where(scales == 0, 1, scales)
+    values = np.round(vectors / safe_scales[..., None]).astype(np.int8)
+    return values, scales.astype(np.float32)
+
+
+def int8_cosine(matrix: np.ndarray, norms: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity between int8 rows and an int8 query.
+
+    Per-row scales cancel out in the cosine, so only the integer values and their
+    precomputed norms are needed. Products are accumulated in int32 to avoid overflow.
+    """
+    dots = matrix.astype(np.int32) @ query.astype(np.int32)
+    denominators = norms * np.linalg.norm(query.astype(np.float32))
+    return dots.astype(np.float32) / np.where(denominators == 0, 1, denominators)
+
+
+def cosine_topk(matrix: np.ndarray, norms: np.ndarray, query: np.ndarray, k: int, threshold: float = -1.0) -> np.ndarray:
+    """
+    Indices of the `k` rows of `matrix` most cosine-similar to `query`, best first.
+
+    `norms` are the precomputed row norms. Zero vectors and rows scoring below
+    `threshold` are skipped, and the full sort is replaced by an O(N) partition.
+    """
+    query_norm = np.linalg.norm(query)
+    valid = np.flatnonzero(norms > 0)
+    if query_norm == 0 or valid.size == 0:
+        return np.empty(0, dtype=np.int64)
+
+    scores = (matrix[valid] @ query) / (norms[valid] * query_norm)
+    keep = scores >= threshold
+    valid, scores = valid[keep], scores[keep]
+    if valid.size > k:
+        top = np.argpartition(-scores, k)[:k]
+        valid, scores = valid[top], scores[top]
+    return valid[np.argsort(-scores)]
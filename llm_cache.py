@@ -0,0 +1,51 @@
+import asyncio
+import functools
+import hashlib
+import json
+from diskcache import Cache
+
+# Persistent cache of LLM completions keyed on the exact request
+LLM_CACHE_DIR = "./.llm_cache"
+LLM_CACHE_TTL = 24 * 60 * 60  # Seconds before a cached completion is requested again
+
+llm_cache = Cache(LLM_CACHE_DIR)
+
+
+def llm_cache_key(model: str, messages: list, temperature: float = None, response_format=None) -> str:
+    """Hash everything that determines a completion into a stable cache key."""
+    format_name = getattr(response_format, "__name__", response_format)
+    payload = json.dumps([model, messages, temperature, format_name], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cached_llm(fn):
+    """
+    Cache the result of an LLM call on disk, keyed on model, messages, temperature
+    and response format.
+
+    The wrapped function (sync or async) must accept a client as its first argument
+    and `model`, `messages`, `temperature` and `response_format` as keyword arguments,
+    and return a picklable value.
+    """
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(client, *, model, messages, temperature=None, response_format=None):
+            key = llm_cache_key(model, messages, temperature, response_format)
+            cached = llm_cache.get(key)
+            if cached is not None:
+                return cached
+            result = await fn(client, model=model, messages=messages, temperature=temperature, response_format=response_format)
+            llm_cache.set(key, result, expire=LLM_CACHE_TTL)
+            return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(client, *, model, messages, temperature=None, response_format=None):
+        key = llm_cache_key(model, messages, temperature, response_format)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+        result = fn(client, model=model, messages=messages, temperature=temperature, response_format=response_format)
+        llm_cache.set(key, result, expire=LLM_CACHE_TTL)
+        return result
+    return wrapper
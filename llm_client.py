@@ -0,0 +1,18 @@
+import os
+import httpx
+from dotenv import load_dotenv
+from openai import OpenAI
+
+load_dotenv(override=True)
+
+# One pooled HTTP/2 connection set to api.openai.com shared by every module, so chat turns,
+# embeddings, subqueries and search filtering reuse connections instead of each owning a pool.
+# Async clients are bound to the event loop they run on and are still created per run.
+# Rate limits, timeouts and 5xx responses are retried by the SDK with exponential backoff.
+OPENAI_MAX_RETRIES = 4
+http_client = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=60.0
+)
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client, max_retries=OPENAI_MAX_RETRIES)
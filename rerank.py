@@ -0,0 +1,55 @@
+from typing import List
+import numpy as np
+from openai import OpenAI
+from embeddings import cosine_topk, embed
+
+# Roughly 500 tokens at ~4 characters per token
+CHUNK_CHARS = 2000
+TOP_K_CHUNKS = 20
+
+
+def split_into_chunks(search_results: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """
+    Split the markdown produced by ContentSearchService into citation-preserving chunks.
+
+    Every chunk starts with the '### Result ...' heading of the result it came from, so the
+    article writer can still cite the original website after reranking.
+    """
+    chunks = []
+    for section in search_results.split("\n### ")[1:]:
+        heading, _, body = section.partition("\n")
+        heading = f"### {heading}"
+        paragraphs = [
+            p.strip() for p in body.split("\n\n")
+            if p.strip() and p.strip() not in ("**Extracted Content:**", "```")
+        ]
+
+        current = ""
+        for paragraph in (p.strip("`").strip() for p in paragraphs):
+            if current and len(current) + len(paragraph) > max_chars:
+                chunks.append(f"{heading}\n{current}")
+                current = ""
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        if current:
+            chunks.append(f"{heading}\n{current}")
+    return chunks
+
+
+def rerank_retrieved_content(client: OpenAI, search_results: str, query: str, top_k: int = TOP_K_CHUNKS) -> str:
+    """
+    Keep only the `top_k` chunks of `search_results` most similar to `query`.
+
+    The query and all chunks are embedded in a single batched request and scored with one
+    cosine-similarity matmul. Chunks are returned in their original order so each source's
+    text stays together. Content with `top_k` chunks or fewer is returned unchanged.
+    """
+    chunks = split_into_chunks(search_results)
+    if len(chunks) <= top_k:
+        return search_results
+
+    vectors = embed(client, [query] + chunks)
+    query_vector, chunk_vectors = vectors[0], vectors[1:]
+    norms = np.linalg.norm(chunk_vectors, axis=1)
+    top = np.sort(cosine_topk(chunk_vectors, norms, query_vector, top_k))
+
+    return "# Search and Extracted Content\n\n" + "\n\n".join(chunks[i] for i in top)
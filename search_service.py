@@ -1,17 +1,24 @@
 __all__ = ['search_and_filter']
 
 
+import asyncio
+import difflib
+import functools
 import time
 from pydantic import BaseModel
-import requests
-import openai
+import httpx
+import tiktoken
 import json
 import os
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
-from typing import List, Optional
+from selectolax.lexbor import LexborHTMLParser
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from diskcache import Cache
+from typing import AsyncIterator, Iterator, List, Optional
 from dataclasses import dataclass
 from dotenv import load_dotenv
+from llm_client import client
+from utils.async_runner import run_async
 
 
 # Load environment variables
@@ -26,8 +33,48 @@ class Config:
     SERPER_API_KEY = SERPER_API_KEY  # In production, this should be in env vars
     USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
     DEFAULT_TIMEOUT = 10
+    ASYNC_TIMEOUT = 15  # Per-request timeout for the concurrent fetch layer
+    MAX_CONCURRENT_REQUESTS = 50  # Connection cap shared by search and extraction requests
+    WEB_CACHE_DIR = "./.web_cache"  # Persistent cache of extracted page content
+    WEB_CACHE_TTL = 24 * 60 * 60  # Seconds before a cached page must be fully refetched
+    WEB_CACHE_FRESH = 6 * 60 * 60  # Seconds a cached page is served without even a conditional request
     MIN_PARAGRAPH_LENGTH = 50
     MAX_RELEVANT_RESULTS = 10  # Maximum number of relevant results to return
+    MAX_CANDIDATES_PER_QUERY = 50  # Results kept from each search response before filtering
+    MAX_FILTER_CANDIDATES = 30  # Results sent to the LLM filter after a cheap title pre-rank
+    MAX_FILTER_TOKENS = 3500  # Token budget for the candidate list in the filter prompt
+    FILTER_MODEL = "gpt-4o-mini"  # Relevance filtering is classification-style work; the small model suffices
+
+
+# Body of the formatted document when no relevant result was found
+NO_RESULTS_MESSAGE = "No relevant results found."
+
+
+# Statuses that signal a transient upstream problem worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=1, max=10),
+    retry=retry_if_exception_type((httpx.TransportError, httpx.HTTPStatusError)),
+    reraise=True
+)
+async def send_with_retry(http: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Send a request, retrying timeouts, connection errors and RETRY_STATUSES with jittered backoff.
+
+    Other error statuses are returned as-is for the caller to handle.
+    """
+    response = await http.request(method, url, **kwargs)
+    if response.status_code in RETRY_STATUSES:
+        response.raise_for_status()
+    return response
+
+
+# The primary search host is hard-coded, so a connection error or timeout there means it is down; those
+# fail fast so the Serper backup takes over, and only throttling and server errors are retried
+send_search_with_retry = send_with_retry.retry_with(retry=retry_if_exception_type(httpx.HTTPStatusError))
 
 
 # Data Models
@@ -49,75 +96,69 @@ class RelevantResults(BaseModel):
 class SearchClient:
     def __init__(self):
         self.headers = {"User-Agent": Config.USER_AGENT}
+        self.serper_headers = {
+            'X-API-KEY': Config.SERPER_API_KEY,
+            'Content-Type': 'application/json'
+        }
     
-    def search(self, query: str, sources: List[str] = None) -> List[dict]:
-        results = []
-        for source in sources or [""]:
-            search_query = f"{query} site:{source.strip()}" if source else query
-            params = {
-                "q": search_query,
-                "format": "json",
-                "engines": "google"
-            }
-            
-            try:
-                response = requests.get(
-                    Config.SEARCH_API_URL,
-                    params=params,
-                    headers=self.headers,
-                    timeout=Config.DEFAULT_TIMEOUT
-                )
-                response.raise_for_status()
-                data = response.json()
-                results.extend(data.get("results", []))
-            except Exception as e:
-                print(f"Search error for '{search_query}': {e}")
+    async def search(self, http: httpx.AsyncClient, query: str, source: str = "") -> List[dict]:
+        search_query = f"{query} site:{source.strip()}" if source else query
+        params = {
+            "q": search_query,
+            "format": "json",
+            "engines": "google"
+        }
         
-        return results
+        try:
+            response = await send_search_with_retry(
+                http,
+                "GET",
+                Config.SEARCH_API_URL,
+                params=params,
+                headers=self.headers
+            )
+            response.raise_for_status()
+            data = response.json()
+            # Only titles and URLs are used downstream, so drop everything else right away
+            return [
+                {"title": item.get("title", ""), "url": item.get("url", "")}
+                for item in data.get("results", [])[:Config.MAX_CANDIDATES_PER_QUERY]
+            ]
+        except Exception as e:
+            print(f"Search error for '{search_query}': {e}")
+            return []
     
-    def search_serper(self, query: str, sources: List[str] = None) -> List[dict]:
+    async def search_serper(self, http: httpx.AsyncClient, query: str, source: str = "") -> List[dict]:
         """Backup search method using Serper API"""
         results = []
         
-        for source in sources or [""]:
-            try:
-                search_query = f"{query} site:{source.strip()}" if source else query
-                
-                # Prepare the request to Serper API
-                payload = json.dumps({
-                    "q": search_query
-                })
-                
-                headers = {
-                    'X-API-KEY': Config.SERPER_API_KEY,
-                    'Content-Type': 'application/json'
-                }
-                
-                response = requests.post(
-                    Config.SERPER_API_URL, 
-                    headers=headers, 
-                    data=payload,
-                    timeout=Config.DEFAULT_TIMEOUT
-                )
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                # Extract relevant results from Serper API response
-                # Serper API has a different response format, so we need to transform it
-                organic_results = data.get("organic", [])
-                
-                for item in organic_results:
-                    results.append({
-                        "title": item.get("title", ""),
-                        "url": item.get("link", ""),
-                        "snippet": item.get("snippet", "")
-                    })
-                
-                print(f"Serper API backup search for '{search_query}' found {len(organic_results)} results")
-                
-            except Exception as e:
-                print(f"Serper API search error for '{query}': {e}")
+        try:
+            search_query = f"{query} site:{source.strip()}" if source else query
+            
+            response = await send_with_retry(
+                http,
+                "POST",
+                Config.SERPER_API_URL, 
+                headers=self.serper_headers, 
+                json={"q": search_query}
+            )
+            
+            response.raise_for_status()
+            data = response.json()
+            
+            # Extract relevant results from Serper API response
+            # Serper API has a different response format, so we need to transform it
+            organic_results = data.get("organic", [])
+            
+            results = [
+                {"title": item.get("title", ""), "url": item.get("link", "")}
+                for item in organic_results[:Config.MAX_CANDIDATES_PER_QUERY]
+            ]
+            
+            print(f"Serper API backup search for '{search_query}' found {len(organic_results)} results")
+            
+        except Exception as e:
+            print(f"Serper API search error for '{query}': {e}")
         
         return results
 
@@ -125,33 +166,82 @@ class SearchClient:
 class ContentExtractor:
     def __init__(self):
         self.headers = {"User-Agent": Config.USER_AGENT}
+        self.cache = Cache(Config.WEB_CACHE_DIR)
     
-    def extract_paragraphs(self, url: str) -> str:
+    async def extract_paragraphs(self, http: httpx.AsyncClient, url: str) -> str:
+        # Serve recently fetched pages straight from the cache; revalidate older ones with a
+        # conditional request instead of re-downloading them
+        cached = self.cache.get(url)
+        if cached and time.time() - cached["ts"] < Config.WEB_CACHE_FRESH:
+            return cached["content"]
+        headers = dict(self.headers)
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        
         try:
-            response = requests.get(url, headers=self.headers, timeout=Config.DEFAULT_TIMEOUT)
+            response = await send_with_retry(http, "GET", url, headers=headers, follow_redirects=True)
+            if response.status_code == 304 and cached:
+                # Still current: restart the freshness window and expiry so the next calls skip the request
+                self.cache.set(url, {**cached, "ts": time.time()}, expire=Config.WEB_CACHE_TTL)
+                return cached["content"]
             response.raise_for_status()
+            # Parse in a worker thread so large pages don't stall the other requests on the event loop
+            content = await asyncio.to_thread(ContentExtractor.parse_paragraphs, response.text)
             
-            soup = BeautifulSoup(response.text, "html.parser")
-            paragraphs = soup.find_all("p")
-            
-            content = "\n\n".join(
-                p.get_text(strip=True) 
-                for p in paragraphs 
-                if len(p.get_text(strip=True)) > Config.MIN_PARAGRAPH_LENGTH
-            )
+            self.cache.set(url, {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content": content,
+                "ts": time.time()
+            }, expire=Config.WEB_CACHE_TTL)
             return content
             
         except Exception as e:
             print(f"Extraction error for {url}: {e}")
             return ""
+    
+    @staticmethod
+    def parse_paragraphs(html: str) -> str:
+        """Join the text of every sufficiently long <p> in `html`; pure CPU work, no I/O."""
+        tree = LexborHTMLParser(html)
+        return "\n\n".join(
+            text
+            for p in tree.css("p")
+            if len(text := p.text(strip=True)) > Config.MIN_PARAGRAPH_LENGTH
+        )
 
 # LLM Filter
+# Only depends on Config, so it is built once at import rather than on every filter call
+_SYSTEM_PROMPT = f"""You are a search result filter. Analyze the search results and return ONLY the most relevant results.
+                        Important rules:
+                        1. Return maximum {Config.MAX_RELEVANT_RESULTS} results
+                        2. Sort by relevance (most relevant first)
+                        3. Only include highly relevant results"""
+
+@functools.lru_cache(maxsize=1)
+def _filter_encoding() -> tiktoken.Encoding:
+    """Tokenizer of the filter model, loaded on first use since tiktoken may fetch it."""
+    return tiktoken.get_encoding("o200k_base")
+
 class LLMFilter:
  
-    def __init__(self, api_key: str):
-        self.client = openai.OpenAI(api_key=api_key)
+    def __init__(self):
+        self.client = client
     
     def filter_relevant(self, topic: str, results: List[dict]) -> List[dict]:
+        return list(self.stream_relevant(topic, results))
+    
+    def stream_relevant(self, topic: str, results: List[dict]) -> Iterator[dict]:
+        """
+        Yield the relevant results, most relevant first, as soon as the model has written each one.
+
+        The structured output is streamed and every completed {"title", "url"} object is
+        decoded as it arrives, so callers can start using the first results while the
+        model is still ranking the rest.
+        """
         minimal_results = [
             {'title': result.get('title', ''), 'url': result.get('url', '')}
             for result in results 
@@ -160,77 +250,165 @@ class LLMFilter:
         
         print(f"Minimal results: {minimal_results}")
         
+        # Nothing to choose between, so skip the LLM call
+        if len(minimal_results) <= Config.MAX_RELEVANT_RESULTS:
+            yield from minimal_results
+            return
+        
+        # Pre-rank by title similarity to the topic and only let the LLM rank the best candidates
+        if len(minimal_results) > Config.MAX_FILTER_CANDIDATES:
+            matcher = difflib.SequenceMatcher(None, b=topic.lower())
+            def similarity(result):
+                matcher.set_seq1(result['title'].lower())
+                return matcher.ratio()
+            minimal_results = sorted(minimal_results, key=similarity, reverse=True)[:Config.MAX_FILTER_CANDIDATES]
+        
+        # Keep the prompt within a token budget so one bloated title or URL can't blow up latency;
+        # the lowest-ranked candidates are dropped first. The budget is skipped if the tokenizer
+        # can't be loaded (tiktoken downloads it on first use, which fails on offline hosts).
         try:
-            response = self.client.beta.chat.completions.parse(
-                model="gpt-4o",
+            encoding = _filter_encoding()
+        except Exception as e:
+            print(f"Tokenizer load error: {e}")
+        else:
+            budget = Config.MAX_FILTER_TOKENS
+            for i, result in enumerate(minimal_results):
+                budget -= len(encoding.encode(json.dumps(result, separators=(',', ':'))))
+                if budget < 0:
+                    minimal_results = minimal_results[:i]
+                    break
+        
+        filtered_results = []
+        try:
+            with self.client.beta.chat.completions.stream(
+                model=Config.FILTER_MODEL,
                 messages=[
                     {
                         "role": "system",
-                        "content": f"""You are a search result filter. Analyze the search results and return ONLY the most relevant results.
-                        Important rules:
-                        1. Return maximum {Config.MAX_RELEVANT_RESULTS} results
-                        2. Sort by relevance (most relevant first)
-                        3. Only include highly relevant results"""
+                        "content": _SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
-                        "content": f"Topic: {topic}\nResults: {json.dumps(minimal_results)}"
+                        # Compact separators drop the whitespace json.dumps adds by default
+                        "content": f"Topic: {topic}\nResults: {json.dumps(minimal_results, separators=(',', ':'))}"
                     }
                 ],
                 temperature=0.0,
                 response_format=RelevantResults 
-            )
-            
-            result = response.choices[0].message.parsed
+            ) as stream:
+                # The output is {"results": [{...}, ...]}; decode each object of the array once it is complete
+                decoder = json.JSONDecoder()
+                buffer, pos = "", None
+                for event in stream:
+                    if event.type != "content.delta":
+                        continue
+                    buffer += event.delta
+                    if pos is None:
+                        start = buffer.find("[")
+                        if start < 0:
+                            continue
+                        pos = start + 1
+                    while True:
+                        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                            pos += 1
+                        if pos >= len(buffer) or buffer[pos] != "{":
+                            break
+                        try:
+                            item, pos = decoder.raw_decode(buffer, pos)
+                        except json.JSONDecodeError:
+                            break
+                        result = {'title': item.get('title', ''), 'url': item.get('url', '')}
+                        filtered_results.append(result)
+                        yield result
             
-            # Convert RelevantResult objects to minimal_result format dictionaries
-            filtered_results = [{'title': item.title, 'url': item.url} for item in result.results]
             print(f"filtered_results: {filtered_results}")
             
-            return filtered_results
-        
-            
         except Exception as e:
             print(f"LLM filtering error: {e}")
-            return minimal_results
+            # Fall back to the unfiltered candidates that weren't already yielded
+            yielded = {result['url'] for result in filtered_results}
+            yield from (result for result in minimal_results if result['url'] not in yielded)
 
 # Main Service
 class ContentSearchService:
-    def __init__(self, openai_api_key: str):
+    def __init__(self):
         self.search_client = SearchClient()
         self.content_extractor = ContentExtractor()
-        self.llm_filter = LLMFilter(openai_api_key)
+        self.llm_filter = LLMFilter()
     
     def search_and_extract(self, queries: List[str], sources: List[str], topic: str) -> str:
-        # 1. Search with primary method
-        all_results = []
-        for query in queries:
-            results = self.search_client.search(query, sources)
-            all_results.extend(results)
-        
-        # If primary search returns no results, use backup Serper API
-        if not all_results:
-            print("Primary search returned no results. Using Serper API as backup.")
-            for query in queries:
-                backup_results = self.search_client.search_serper(query, sources)
-                all_results.extend(backup_results)
-                
-            print(f"Serper API backup search found {len(all_results)} results")
-        
-        # 2. Filter
-        filtered_results = self.llm_filter.filter_relevant(topic, all_results)
+        return run_async(self.asearch_and_extract(queries, sources, topic))
+    
+    async def asearch_and_extract(self, queries: List[str], sources: List[str], topic: str) -> str:
+        # One pool per call: Streamlit runs each rerun on a new event loop, and an AsyncClient is bound to its loop
+        limits = httpx.Limits(max_connections=Config.MAX_CONCURRENT_REQUESTS)
+        async with httpx.AsyncClient(limits=limits, timeout=Config.ASYNC_TIMEOUT) as http:
+            # 1. Search with primary method, one request per (query, source) pair
+            pairs = [(query, source) for query in queries for source in sources or [""]]
+            all_results = await self._gather_results(
+                self.search_client.search(http, query, source) for query, source in pairs
+            )
+            
+            # If primary search returns no results, use backup Serper API
+            if not all_results:
+                print("Primary search returned no results. Using Serper API as backup.")
+                all_results = await self._gather_results(
+                    self.search_client.search_serper(http, query, source) for query, source in pairs
+                )
+                    
+                print(f"Serper API backup search found {len(all_results)} results")
+            
+            # 2. Deduplicate by URL across all queries and sources, then filter everything in a single call
+            unique_results = {}
+            for result in all_results:
+                unique_results.setdefault(result.get("url"), result)
+            
+            # 3. Start extracting each relevant URL as soon as the filter emits it, while it ranks the rest
+            extractions = []
+            async for result in self._stream_relevant(topic, list(unique_results.values())):
+                task = asyncio.create_task(self.content_extractor.extract_paragraphs(http, result.get("url", "")))
+                extractions.append((result, task))
+            filtered_results = [result for result, _ in extractions]
+            contents = await asyncio.gather(*(task for _, task in extractions))
         
-        # 3. Extract content
         final_results = []
-        for result in filtered_results:
-            url = result.get("url", "")
-            content = self.content_extractor.extract_paragraphs(url)
+        for result, content in zip(filtered_results, contents):
             result["extracted_content"] = content
             final_results.append(result)
         
         # 4. Format output
         return self._format_markdown(topic, final_results)
     
+    async def _stream_relevant(self, topic: str, results: List[dict]) -> AsyncIterator[dict]:
+        """Run the blocking streaming filter in a worker thread and relay its results to the event loop."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        
+        def produce():
+            try:
+                for result in self.llm_filter.stream_relevant(topic, results):
+                    loop.call_soon_threadsafe(queue.put_nowait, result)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+        
+        producer = loop.run_in_executor(None, produce)
+        while (result := await queue.get()) is not done:
+            yield result
+        await producer
+    
+    @staticmethod
+    async def _gather_results(tasks) -> List[dict]:
+        """Run search coroutines concurrently and flatten their result lists."""
+        responses = await asyncio.gather(*tasks, return_exceptions=True)
+        results = []
+        for response in responses:
+            if isinstance(response, Exception):
+                print(f"Search task error: {response}")
+                continue
+            results.extend(response)
+        return results
+    
     def _format_markdown(self, topic: str, results: List[dict]) -> str:
         lines = [
             "# Search and Extracted Content\n",
@@ -239,7 +417,7 @@ class ContentSearchService:
         ]
         
         if not results:
-            lines.append("No relevant results found.")
+            lines.append(NO_RESULTS_MESSAGE)
             return "\n".join(lines)
         
         for i, result in enumerate(results, 1):
@@ -260,7 +438,7 @@ if __name__ == "__main__":
         raise ValueError("OPENAI_API_KEY not found in environment variables")
     
     # Initialize the service
-    service = ContentSearchService(OPENAI_API_KEY)
+    service = ContentSearchService()
     
     # Define search parameters
     queries = ["openai"]
@@ -0,0 +1,72 @@
+import sqlite3
+import threading
+import time
+from typing import Optional
+import numpy as np
+from embeddings import int8_cosine, quantize_int8
+
+
+class SemanticCache:
+    """
+    SQLite-backed cache that returns a stored response when a new prompt is
+    semantically close to one that has already been answered.
+
+    Entries are grouped by namespace, which must cover everything a response depends
+    on besides the prompt (the article and the conversation so far), so a response
+    is never replayed into another context. Entries expire after `ttl` seconds. Vectors are
+    stored as int8 with a per-row scale and norm, a quarter of the float32 size.
+    Prompts seen before verbatim are answered by `get_exact` without an embedding.
+    """
+
+    def __init__(self, path: str = ".semantic_cache.sqlite", ttl: int = 3600):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries_int8 ("
+            "namespace TEXT, prompt TEXT, response TEXT, vector BLOB, scale REAL, norm REAL, created REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_int8_namespace ON entries_int8 (namespace)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_int8_prompt ON entries_int8 (namespace, prompt)")
+        self.conn.commit()
+
+    def get_exact(self, prompt: str, namespace: str = "") -> Optional[str]:
+        """Return the newest unexpired response stored for exactly this prompt, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response FROM entries_int8 WHERE namespace = ? AND prompt = ? AND created >= ? "
+                "ORDER BY created DESC LIMIT 1",
+                (namespace, prompt, time.time() - self.ttl)
+            ).fetchone()
+        return row[0] if row else None
+
+    def check(self, vector: np.ndarray, namespace: str = "", threshold: float = 0.92) -> Optional[str]:
+        """Return the cached response most similar to `vector`, or None below `threshold`."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT response, vector, norm FROM entries_int8 WHERE namespace = ? AND created >= ?",
+                (namespace, time.time() - self.ttl)
+            ).fetchall()
+        if not rows:
+            return None
+
+        matrix = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.int8).reshape(len(rows), -1)
+        norms = np.array([row[2] for row in rows], dtype=np.float32)
+        query, _ = quantize_int8(vector)
+        scores = int8_cosine(matrix, norms, query)
+        best = int(np.argmax(scores))
+        return rows[best][0] if scores[best] >= threshold else None
+
+    def store(self, prompt: str, response: str, vector: np.ndarray, namespace: str = "") -> None:
+        """Store a response under its quantized prompt embedding and drop expired entries."""
+        values, scale = quantize_int8(vector)
+        norm = float(np.linalg.norm(values.astype(np.float32)))
+        now = time.time()
+        with self.lock:
+            self.conn.execute("DELETE FROM entries_int8 WHERE created < ?", (now - self.ttl,))
+            self.conn.execute(
+                "INSERT INTO entries_int8 (namespace, prompt, response, vector, scale, norm, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, prompt, response, values.tobytes(), float(scale), norm, now)
+            )
+            self.conn.commit()
@@ -0,0 +1,19 @@
+import asyncio
+
+
+def run_async(coro):
+    """
+    Run a coroutine to completion from synchronous code.
+
+    Streamlit executes the script in a worker thread that may not have an event
+    loop yet, so one is created on demand and kept for later calls. Combined with
+    nest_asyncio this also works when a loop is already running.
+    """
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = None
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop.run_until_complete(coro)